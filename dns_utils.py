@@ -1,9 +1,25 @@
-import dns.resolver
+import asyncio
+import random
+import socket
+import struct
+import dns.message
+import dns.asyncquery
+import dns.asyncbackend
+import dns.rdatatype
+import dns.exception
+import functools
+import ipaddress
+import json
+import os
+import threading
 import time
 import logging
+import statistics
 import platform
 import subprocess # For getting system DNS on Windows/Linux
 
+from PyQt6.QtCore import QRunnable, QThreadPool
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # List of standard public DNS servers to test against
@@ -19,28 +35,156 @@ STANDARD_DNS_SERVERS = {
 # Domain to use for latency test (should be common, unlikely to be cached locally)
 TEST_DOMAIN = "www.google.com" # Or another high-availability domain
 
+# Pre-encoded query wire bytes reused across probes: building a full Resolver
+# (or even re-encoding a Message) per call is pure throwaway work. Only the
+# 2-byte ID at offset 0 is patched per probe - reusing one ID for everything
+# would let deduplicating resolvers skew the results.
+@functools.lru_cache(maxsize=8)
+def _wire_template(domain):
+    return bytes(dns.message.make_query(domain, dns.rdatatype.A).to_wire())
+
+
+# Each thread patches IDs into its own copies of the templates
+_thread_local = threading.local()
+
+
+def _next_wire_query(domain):
+    """Returns (wire_bytes, query_id) for domain with a fresh random ID patched in."""
+    bufs = getattr(_thread_local, 'query_bufs', None)
+    if bufs is None:
+        bufs = _thread_local.query_bufs = {}
+    buf = bufs.get(domain)
+    if buf is None:
+        buf = bufs[domain] = bytearray(_wire_template(domain))
+    query_id = random.getrandbits(16)
+    struct.pack_into('!H', buf, 0, query_id)
+    return buf, query_id
+
+def _get_windows_dns_servers_api():
+    """Enumerates DNS servers via the Win32 IP Helper API (GetAdaptersAddresses).
+
+    A single in-process call, robust to OS locale, unlike parsing ipconfig
+    output (which is also a ~100ms process spawn). Raises ImportError/OSError
+    if the API is unavailable or fails, in which case the caller falls back to
+    the ipconfig path.
+    """
+    import ctypes
+    from ctypes import wintypes
+
+    AF_UNSPEC = 0
+    GAA_FLAG_SKIP_ANYCAST = 0x2
+    GAA_FLAG_SKIP_MULTICAST = 0x4
+    ERROR_BUFFER_OVERFLOW = 111
+    IF_OPER_STATUS_UP = 1
+    NI_MAXHOST = 1025
+    NI_NUMERICHOST = 0x02
+
+    class SOCKET_ADDRESS(ctypes.Structure):
+        _fields_ = [
+            ('lpSockaddr', ctypes.c_void_p),
+            ('iSockaddrLength', wintypes.INT),
+        ]
+
+    class IP_ADAPTER_DNS_SERVER_ADDRESS(ctypes.Structure):
+        pass
+
+    IP_ADAPTER_DNS_SERVER_ADDRESS._fields_ = [
+        ('Length', wintypes.ULONG),
+        ('Reserved', wintypes.DWORD),
+        ('Next', ctypes.POINTER(IP_ADAPTER_DNS_SERVER_ADDRESS)),
+        ('Address', SOCKET_ADDRESS),
+    ]
+
+    # Only the leading fields of IP_ADAPTER_ADDRESSES_LH are declared; the
+    # linked list is walked via Next so the trailing fields are never touched.
+    class IP_ADAPTER_ADDRESSES(ctypes.Structure):
+        pass
+
+    IP_ADAPTER_ADDRESSES._fields_ = [
+        ('Length', wintypes.ULONG),
+        ('IfIndex', wintypes.DWORD),
+        ('Next', ctypes.POINTER(IP_ADAPTER_ADDRESSES)),
+        ('AdapterName', ctypes.c_char_p),
+        ('FirstUnicastAddress', ctypes.c_void_p),
+        ('FirstAnycastAddress', ctypes.c_void_p),
+        ('FirstMulticastAddress', ctypes.c_void_p),
+        ('FirstDnsServerAddress', ctypes.POINTER(IP_ADAPTER_DNS_SERVER_ADDRESS)),
+        ('DnsSuffix', ctypes.c_wchar_p),
+        ('Description', ctypes.c_wchar_p),
+        ('FriendlyName', ctypes.c_wchar_p),
+        ('PhysicalAddress', ctypes.c_ubyte * 8),
+        ('PhysicalAddressLength', wintypes.ULONG),
+        ('Flags', wintypes.ULONG),
+        ('Mtu', wintypes.ULONG),
+        ('IfType', wintypes.DWORD),
+        ('OperStatus', ctypes.c_int),
+    ]
+
+    iphlpapi = ctypes.windll.iphlpapi
+    ws2_32 = ctypes.windll.ws2_32
+
+    flags = GAA_FLAG_SKIP_ANYCAST | GAA_FLAG_SKIP_MULTICAST
+    size = wintypes.ULONG(15 * 1024)  # MSDN-recommended initial buffer
+    ret = ERROR_BUFFER_OVERFLOW
+    buf = None
+    for _ in range(3):  # Retry if adapters changed between size query and fill
+        buf = ctypes.create_string_buffer(size.value)
+        ret = iphlpapi.GetAdaptersAddresses(AF_UNSPEC, flags, None, buf, ctypes.byref(size))
+        if ret != ERROR_BUFFER_OVERFLOW:
+            break
+    if ret != 0:
+        raise OSError(f"GetAdaptersAddresses failed with error code {ret}")
+
+    servers = []
+    adapter = ctypes.cast(buf, ctypes.POINTER(IP_ADAPTER_ADDRESSES))
+    while adapter:
+        info = adapter.contents
+        if info.OperStatus == IF_OPER_STATUS_UP:
+            dns_addr = info.FirstDnsServerAddress
+            while dns_addr:
+                sockaddr = dns_addr.contents.Address
+                host = ctypes.create_string_buffer(NI_MAXHOST)
+                if ws2_32.getnameinfo(sockaddr.lpSockaddr, sockaddr.iSockaddrLength,
+                                      host, NI_MAXHOST, None, 0, NI_NUMERICHOST) == 0:
+                    servers.append(host.value.decode())
+                dns_addr = dns_addr.contents.Next
+        adapter = info.Next
+    return servers
+
+
+@functools.lru_cache(maxsize=1)
 def get_system_dns_servers():
-    """Tries to get the system's configured DNS servers."""
+    """Tries to get the system's configured DNS servers.
+
+    The result is cached for the lifetime of the process (system DNS almost
+    never changes while the app is running), so repeat benchmark runs skip the
+    process spawn / file parse. Call get_system_dns_servers.cache_clear() to
+    force re-detection.
+    """
     servers = []
     system = platform.system()
     try:
         if system == "Windows":
-            # Execute ipconfig /all and parse output
-            cmd = "ipconfig /all"
-            proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, text=True)
-            output, _ = proc.communicate()
-            in_dns_section = False
-            for line in output.splitlines():
-                line = line.strip()
-                if "DNS Servers" in line:
-                    in_dns_section = True
-                    parts = line.split(':')
-                    if len(parts) > 1 and parts[1].strip():
-                         servers.append(parts[1].strip())
-                elif in_dns_section and line.startswith(" ") and ":" not in line and line:
-                    servers.append(line)
-                elif line == "": # Blank line often separates sections
-                    in_dns_section = False
+            try:
+                servers = _get_windows_dns_servers_api()
+            except (ImportError, OSError, AttributeError) as api_err:
+                logging.warning(f"IP Helper API lookup failed ({api_err}); falling back to ipconfig.")
+                # Execute ipconfig /all and parse output (locale-dependent fallback)
+                cmd = "ipconfig /all"
+                proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, text=True)
+                output, _ = proc.communicate()
+                in_dns_section = False
+                for line in output.splitlines():
+                    line = line.strip()
+                    if "DNS Servers" in line:
+                        in_dns_section = True
+                        parts = line.split(':')
+                        if len(parts) > 1 and parts[1].strip():
+                             servers.append(parts[1].strip())
+                    elif in_dns_section and line.startswith(" ") and ":" not in line and line:
+                        servers.append(line)
+                    elif line == "": # Blank line often separates sections
+                        in_dns_section = False
 
         elif system == "Linux" or system == "Darwin": # Linux or macOS
             # Parse /etc/resolv.conf
@@ -54,63 +198,344 @@ def get_system_dns_servers():
     except Exception as e:
         logging.warning(f"Could not automatically detect system DNS servers: {e}")
 
-    # Return unique, valid-looking IPs (simple check)
-    valid_servers = [s for s in set(servers) if '.' in s or ':' in s] # Basic IP format check
+    # Return unique, genuinely valid IPs: anything else (hostnames, stray
+    # ipconfig text) would otherwise burn a full probe timeout later
+    valid_servers = []
+    for s in set(servers):
+        try:
+            ipaddress.ip_address(s)
+            valid_servers.append(s)
+        except ValueError:
+            logging.debug(f"Rejected non-IP DNS server entry: {s!r}")
     logging.info(f"Detected system DNS servers: {valid_servers}")
-    return valid_servers if valid_servers else ['OS Default (Not Detected)'] # Fallback label
+    # Tuple so the cached value is immutable
+    return tuple(valid_servers) if valid_servers else ('OS Default (Not Detected)',) # Fallback label
+
+def measure_dns_latency(domain, dns_server, timeout=2, sock=None):
+    """Measures latency for a single DNS query.
 
-def measure_dns_latency(domain, dns_server, timeout=2):
-    """Measures latency for a single DNS query."""
-    resolver = dns.resolver.Resolver()
-    resolver.nameservers = [dns_server]
-    resolver.timeout = timeout
-    resolver.lifetime = timeout
+    Sends the pre-encoded wire template (with a fresh ID) straight over a UDP
+    socket and times only the sendto->recvfrom pair, so the measurement is
+    pure network latency with no per-probe Python encode work. Pass a
+    datagram `sock` to reuse one socket across several probes of the same
+    server; stale replies from earlier probes are skipped by ID.
+    """
+    own_sock = sock is None
+    if own_sock:
+        af = socket.AF_INET6 if ':' in dns_server else socket.AF_INET
+        sock = socket.socket(af, socket.SOCK_DGRAM)
+    try:
+        wire, query_id = _next_wire_query(domain)
+        sock.settimeout(timeout)
+        start_time = time.perf_counter()
+        sock.sendto(wire, (dns_server, 53))
+        deadline = start_time + timeout
+        while True:
+            response, _addr = sock.recvfrom(512)
+            if len(response) >= 2 and struct.unpack_from('!H', response)[0] == query_id:
+                break
+            # Stale reply from an earlier probe on a reused socket; wait for ours
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise socket.timeout()
+            sock.settimeout(remaining)
+        end_time = time.perf_counter()
+        latency_ms = (end_time - start_time) * 1000
+        return round(latency_ms, 2), "Success"
+    except (socket.timeout, TimeoutError):
+        return -1, f"Timeout ({timeout}s)"
+    except Exception as e:
+        logging.warning(f"DNS query failed for {domain} @{dns_server}: {e}")
+        return -1, f"Error ({type(e).__name__})"
+    finally:
+        if own_sock:
+            sock.close()
 
+
+async def measure_dns_latency_async(domain, dns_server, timeout=2, sock=None, query=None):
+    """Async variant of measure_dns_latency.
+
+    Callers probing a server repeatedly should pass their own `query` Message;
+    its ID is refreshed per probe so deduplicating resolvers see each probe as
+    a distinct query.
+    """
+    if query is None:
+        query = dns.message.make_query(domain, dns.rdatatype.A)
+    query.id = random.getrandbits(16)
     start_time = time.perf_counter()
     try:
-        # Perform a simple A record query
-        resolver.resolve(domain, 'A', raise_on_no_answer=False) # Don't error if no A record specifically
+        await dns.asyncquery.udp(query, dns_server, timeout=timeout, sock=sock)
         end_time = time.perf_counter()
         latency_ms = (end_time - start_time) * 1000
         return round(latency_ms, 2), "Success"
     except dns.exception.Timeout:
         return -1, f"Timeout ({timeout}s)"
-    except dns.resolver.NoNameservers as e:
-         return -1, f"No Nameservers ({e})"
     except Exception as e:
         logging.warning(f"DNS query failed for {domain} @{dns_server}: {e}")
         return -1, f"Error ({type(e).__name__})"
 
 
-def run_dns_benchmark():
-    """Runs latency tests against system and standard DNS servers."""
-    results = {}
+# Cap concurrent in-flight probes so a long server list can't exhaust sockets
+MAX_CONCURRENT_PROBES = 16
+
+# Per-server result cache so repeat benchmark runs skip re-probing. Dead
+# servers are the expensive case (each costs a full timeout), so failures are
+# cached much longer than successes (whose latency drifts).
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".pywebpulse", "dns_cache.json")
+SUCCESS_TTL_SECONDS = 60
+FAILURE_TTL_SECONDS = 15 * 60
+
+
+def _load_cache():
+    """Loads the on-disk probe cache; an unreadable cache is just empty."""
+    try:
+        with open(CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_cache(cache):
+    """Best-effort write of the probe cache; failures only cost the speedup."""
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(CACHE_FILE, 'w') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        logging.warning(f"Could not persist DNS cache to {CACHE_FILE}: {e}")
+
+
+def _cached_result(cache, ip):
+    """Returns a result dict for a fresh cache entry, or None to probe."""
+    entry = cache.get(ip)
+    if not entry or entry.get('expires_at', 0) <= time.time():
+        return None
+    if entry.get('status') == 'Success':
+        return {"latency_ms": entry['latency_ms'], "min_ms": entry['min_ms'],
+                "samples": entry['samples'], "status": "Success"}
+    return {"latency_ms": -1, "min_ms": -1, "samples": 0,
+            "status": f"Unavailable (cached: {entry.get('status', 'failure')})"}
+
+
+def _cache_store(cache, ip, result):
+    """Records a probe outcome with a status-dependent TTL."""
+    ttl = SUCCESS_TTL_SECONDS if result['status'] == 'Success' else FAILURE_TTL_SECONDS
+    cache[ip] = {
+        "status": result['status'],
+        "latency_ms": result['latency_ms'],
+        "min_ms": result['min_ms'],
+        "samples": result['samples'],
+        "expires_at": time.time() + ttl,
+    }
+
+
+async def _benchmark_server(ip, timeout, samples, semaphore):
+    """Probes one server N times over one shared socket and aggregates.
+
+    A single probe is dominated by network jitter, so the median of several
+    samples is reported as the headline latency (plus the min for reference).
+    Creating a socket per probe costs extra syscalls, so one UDP socket is
+    opened per server and reused; samples therefore run sequentially within a
+    server (responses on a shared socket are otherwise ambiguous), while the
+    servers themselves still run concurrently.
+    """
+    async with semaphore:
+        af = socket.AF_INET6 if ':' in ip else socket.AF_INET
+        backend = dns.asyncbackend.get_default_backend()
+        sock = await backend.make_socket(af, socket.SOCK_DGRAM, 0)
+        query = dns.message.make_query(TEST_DOMAIN, dns.rdatatype.A)
+        try:
+            outcomes = []
+            for _ in range(samples):
+                outcomes.append(
+                    await measure_dns_latency_async(TEST_DOMAIN, ip, timeout, sock=sock, query=query)
+                )
+        finally:
+            await sock.close()
+    latencies = [latency for latency, status in outcomes if status == "Success"]
+    if latencies:
+        return {
+            "latency_ms": round(statistics.median(latencies), 2),
+            "min_ms": round(min(latencies), 2),
+            "samples": len(latencies),
+            "status": "Success",
+        }
+    # All probes failed; surface the first failure status
+    return {"latency_ms": -1, "min_ms": -1, "samples": 0, "status": outcomes[0][1]}
+
+
+def _collect_servers():
+    """Builds the (label, ip) list to benchmark: system DNS + standard servers.
 
-    # Test System DNS
+    Returns (results, servers) where results is pre-seeded with a
+    "Not Detected" entry when no system server could be found.
+    """
+    results = {}
+    servers = []
     system_servers = get_system_dns_servers()
     if system_servers and system_servers[0] != 'OS Default (Not Detected)':
          # Test only the first detected system server for simplicity, or loop through all
          server_ip = system_servers[0]
-         latency, status = measure_dns_latency(TEST_DOMAIN, server_ip)
-         results[f"System ({server_ip})"] = {"latency_ms": latency, "status": status}
+         servers.append((f"System ({server_ip})", server_ip))
     else:
-         results["System Default"] = {"latency_ms": -1, "status": "Not Detected"}
-
+         results["System Default"] = {"latency_ms": -1, "min_ms": -1, "samples": 0, "status": "Not Detected"}
 
-    # Test Standard DNS Servers
     for name, ip in STANDARD_DNS_SERVERS.items():
-         latency, status = measure_dns_latency(TEST_DOMAIN, ip)
-         results[f"{name} ({ip})"] = {"latency_ms": latency, "status": status}
+         servers.append((f"{name} ({ip})", ip))
+
+    return results, servers
+
+
+def run_dns_benchmark(timeout=2, samples=5):
+    """Runs latency tests against system and standard DNS servers.
+
+    All probes run concurrently on a single asyncio event loop (each query is a
+    pure I/O wait on a socket), so total wall time is roughly one query instead
+    of the sum of all. Each server is probed `samples` times and the median is
+    reported to smooth out jitter.
+    """
+    results, servers = _collect_servers()
+
+    cache = _load_cache()
+    cached = {}
+    to_probe = []
+    for label, ip in servers:
+        cached_result = _cached_result(cache, ip)
+        if cached_result is not None:
+            cached[label] = cached_result
+        else:
+            to_probe.append((label, ip))
+
+    async def _run():
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROBES)
+        coros = [_benchmark_server(ip, timeout, samples, semaphore) for _label, ip in to_probe]
+        return await asyncio.gather(*coros, return_exceptions=True)
+
+    probed = {}
+    if to_probe:
+        for (label, ip), outcome in zip(to_probe, asyncio.run(_run())):
+            if isinstance(outcome, BaseException):
+                logging.warning(f"DNS probe for {label} raised: {outcome}")
+                outcome = {"latency_ms": -1, "min_ms": -1, "samples": 0,
+                           "status": f"Error ({type(outcome).__name__})"}
+            probed[label] = outcome
+            _cache_store(cache, ip, outcome)
+        _save_cache(cache)
+
+    # Iterate the original list so result ordering stays deterministic
+    for label, _ip in servers:
+        results[label] = cached.get(label) or probed[label]
 
     logging.info(f"DNS Benchmark Results: {results}")
     return results
 
+
+class DnsProbeTask(QRunnable):
+    """Benchmarks one DNS server on a Qt thread-pool thread.
+
+    Completion is reported through the plain `on_finished(label, result)`
+    callable, invoked directly on the pool thread. A Qt signal would be
+    queued to the event loop of whichever thread created the emitter, and
+    the callers here (TestWorker) block without spinning one - the delivery
+    would never happen.
+    """
+
+    def __init__(self, label, ip, on_finished, timeout=2, samples=5):
+        super().__init__()
+        self.label = label
+        self.ip = ip
+        self.on_finished = on_finished
+        self.timeout = timeout
+        self.samples = samples
+
+    def run(self):
+        latencies = []
+        status = "Error"
+        # One socket for the whole sample batch
+        af = socket.AF_INET6 if ':' in self.ip else socket.AF_INET
+        sock = socket.socket(af, socket.SOCK_DGRAM)
+        try:
+            sock.bind(('', 0))
+            for _ in range(self.samples):
+                latency, status = measure_dns_latency(TEST_DOMAIN, self.ip, self.timeout, sock=sock)
+                if status == "Success":
+                    latencies.append(latency)
+        finally:
+            sock.close()
+        if latencies:
+            result = {
+                "latency_ms": round(statistics.median(latencies), 2),
+                "min_ms": round(min(latencies), 2),
+                "samples": len(latencies),
+                "status": "Success",
+            }
+        else:
+            result = {"latency_ms": -1, "min_ms": -1, "samples": 0, "status": status}
+        self.on_finished(self.label, result)
+
+
+def run_dns_benchmark_qt(callback, timeout=2, samples=5):
+    """Runs the DNS benchmark on Qt's global thread pool.
+
+    Submits one DnsProbeTask per server to QThreadPool.globalInstance() and
+    invokes `callback(results)` (from a pool thread) once every probe has
+    finished. Unlike run_dns_benchmark this never blocks the calling thread.
+    """
+    results, servers = _collect_servers()
+
+    cache = _load_cache()
+    collected = {}
+    to_probe = []
+    for label, ip in servers:
+        cached_result = _cached_result(cache, ip)
+        if cached_result is not None:
+            collected[label] = cached_result
+        else:
+            to_probe.append((label, ip))
+
+    def finish():
+        # Reassemble in the original server order for deterministic output
+        for server_label, _ip in servers:
+            results[server_label] = collected[server_label]
+        logging.info(f"DNS Benchmark Results: {results}")
+        callback(results)
+
+    if not to_probe:
+        finish()
+        return
+
+    lock = threading.Lock()
+    ips_by_label = dict(to_probe)
+    remaining = [len(to_probe)]
+
+    def on_task_finished(label, result):
+        with lock:
+            collected[label] = result
+            _cache_store(cache, ips_by_label[label], result)
+            remaining[0] -= 1
+            done = remaining[0] == 0
+        if done:
+            _save_cache(cache)
+            finish()
+
+    pool = QThreadPool.globalInstance()
+    # The global pool defaults to the CPU core count, but these tasks are
+    # I/O-bound socket waits - make sure they can actually run concurrently
+    # on low-core machines (bounded by the same cap as the asyncio path)
+    wanted = min(len(to_probe), MAX_CONCURRENT_PROBES)
+    if pool.maxThreadCount() < wanted:
+        pool.setMaxThreadCount(wanted)
+    for label, ip in to_probe:
+        pool.start(DnsProbeTask(label, ip, on_task_finished, timeout, samples))
+
+
 # Example usage (for testing this file directly)
 if __name__ == "__main__":
     benchmark_results = run_dns_benchmark()
     print("DNS Benchmark Results:")
     for server, result in benchmark_results.items():
         if result['status'] == 'Success':
-            print(f"- {server}: {result['latency_ms']:.2f} ms")
+            print(f"- {server}: median {result['latency_ms']:.2f} ms "
+                  f"(min {result['min_ms']:.2f} ms over {result['samples']} samples)")
         else:
             print(f"- {server}: {result['status']}")
\ No newline at end of file
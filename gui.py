@@ -2,6 +2,11 @@ import sys
 import csv
 import json
 import logging
+
+try:
+    import orjson  # Optional: much faster C-level JSON encoder for exports
+except ImportError:
+    orjson = None
 import time
 from datetime import datetime
 import statistics # For median calculation
@@ -9,22 +14,72 @@ import statistics # For median calculation
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QListWidget, QListWidgetItem,
-    QSpinBox, QComboBox, QCheckBox, QTableWidget, QTableWidgetItem,
-    QProgressBar, QStatusBar, QMessageBox, QFileDialog, QTextEdit
+    QSpinBox, QComboBox, QCheckBox, QTableView, QAbstractItemView,
+    QHeaderView, QProgressBar, QStatusBar, QMessageBox, QFileDialog, QTextEdit
 )
-from PyQt6.QtCore import Qt, pyqtSlot
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, pyqtSlot
 
-from settings_manager import load_settings, save_settings
+from settings_manager import load_settings, save_settings, add_result
 from worker import TestWorker
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+
+class ResultsModel(QAbstractTableModel):
+    """Lightweight table model over the result rows.
+
+    Unlike QTableWidget (which allocates a QTableWidgetItem per cell), this
+    reads straight from a list of row tuples, so inserting a row costs one
+    list append and no per-cell Qt objects.
+    """
+
+    HEADERS = ["URL", "Run", "Load Time (ms)", "Status", "Details/Error", "Timestamp"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return self._rows[index.row()][index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def append_rows(self, rows):
+        """Appends a batch of row tuples in one insert notification."""
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+
 class SpeedBenchmarkerApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.settings = load_settings()
         self.test_worker = None
         self.results_data = [] # Store detailed results from worker
+        self._pending_rows = [] # Rows waiting to be flushed into the table
+        self._flush_scheduled = False
+        self._results_version = 0 # Bumped whenever results_data changes
+        self._summary_cache = (-1, None) # (version, summary) memo for reports
 
         self.setWindowTitle("Browse Speed Benchmarker")
         self.setGeometry(100, 100, 900, 700) # x, y, width, height
@@ -47,6 +102,8 @@ class SpeedBenchmarkerApp(QMainWindow):
 
         self.url_list_widget = QListWidget()
         self.url_list_widget.addItems(self.settings.get('urls', []))
+        # Set mirror of the list widget for O(1) duplicate checks in add_url
+        self._url_set = set(self.settings.get('urls', []))
         main_layout.addWidget(QLabel("URLs to Test:"))
         main_layout.addWidget(self.url_list_widget)
 
@@ -127,11 +184,18 @@ class SpeedBenchmarkerApp(QMainWindow):
         # Results Panel
         results_layout = QVBoxLayout()
         results_layout.addWidget(QLabel("Results:"))
-        self.results_table = QTableWidget()
-        self.results_table.setColumnCount(6) # URL, Run, Load Time (ms), Status, Details, Timestamp
-        self.results_table.setHorizontalHeaderLabels(["URL", "Run", "Load Time (ms)", "Status", "Details/Error", "Timestamp"])
+        self.results_model = ResultsModel(self)
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
         self.results_table.setAlternatingRowColors(True)
-        self.results_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers) # Read-only
+        self.results_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers) # Read-only
+        # Column semantics are fixed, so set widths once instead of measuring
+        # every cell with resizeColumnsToContents() on each batch insert
+        header = self.results_table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        for col, width in enumerate([400, 50, 100, 80, 250, 140]):
+            self.results_table.setColumnWidth(col, width)
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch) # URL fills remaining space
         results_layout.addWidget(self.results_table)
 
         # DNS Result
@@ -186,8 +250,8 @@ class SpeedBenchmarkerApp(QMainWindow):
         url = self.url_input.text().strip()
         if url and url.startswith(('http://', 'https://')):
             # Avoid duplicates
-            items = [self.url_list_widget.item(i).text() for i in range(self.url_list_widget.count())]
-            if url not in items:
+            if url not in self._url_set:
+                self._url_set.add(url)
                 self.url_list_widget.addItem(url)
                 self.url_input.clear()
             else:
@@ -202,10 +266,12 @@ class SpeedBenchmarkerApp(QMainWindow):
             self.status_bar.showMessage("Select a URL to remove.", 3000)
             return
         for item in selected_items:
+            self._url_set.discard(item.text())
             self.url_list_widget.takeItem(self.url_list_widget.row(item))
 
     def clear_urls(self):
         self.url_list_widget.clear()
+        self._url_set.clear()
 
     # --- Test Execution Control ---
     def update_config_from_ui(self):
@@ -250,11 +316,11 @@ class SpeedBenchmarkerApp(QMainWindow):
         self.test_worker.progress.connect(self.update_progress)
         self.test_worker.status_update.connect(self.update_status)
         self.test_worker.result_ready.connect(self.handle_result)
+        self.test_worker.results_batch_ready.connect(self.handle_result_batch)
         self.test_worker.finished.connect(self.test_finished)
         self.test_worker.error_occurred.connect(self.handle_worker_error)
         self.test_worker.dns_results_ready.connect(self.handle_dns_results)  # Connect new signal
         self.test_worker.start()
-        self.test_worker.start()
 
     def stop_test(self):
         if self.test_worker and self.test_worker.isRunning():
@@ -301,40 +367,46 @@ class SpeedBenchmarkerApp(QMainWindow):
     @pyqtSlot(str)
     def update_status(self, message):
         self.status_bar.showMessage(message)
-        self.log_area.append(f"[{datetime.now().strftime('%H:%M:%S')}] {message}") # Also log status
+        # time.strftime stays at C level; datetime.now().strftime built a fresh
+        # datetime object per log line
+        self.log_area.append(f"[{time.strftime('%H:%M:%S')}] {message}") # Also log status
 
     # Add this method to SpeedBenchmarkerApp class
     @pyqtSlot(dict)
     def handle_dns_results(self, dns_results):
-        self.dns_results_area.clear()
-        self.dns_results_area.append("--- DNS Latency Test ---")
+        # Build the whole text in memory: each QTextEdit.append triggers a
+        # full document reflow, so one setPlainText replaces N reflows
+        lines = ["--- DNS Latency Test ---"]
         for server, result in dns_results.items():
             if result['status'] == 'Success':
-                self.dns_results_area.append(f"- {server}: {result['latency_ms']:.2f} ms")
+                lines.append(f"- {server}: {result['latency_ms']:.2f} ms")
             else:
-                self.dns_results_area.append(f"- {server}: {result['status']}")
-        self.dns_results_area.append("------------------------")
+                lines.append(f"- {server}: {result['status']}")
+        lines.append("------------------------")
+        self.dns_results_area.setPlainText("\n".join(lines))
 
     @pyqtSlot(dict)
     def handle_result(self, result):
         """Receives a result dictionary from the worker and updates the table."""
         self.results_data.append(result) # Store raw data
-
-        row_position = self.results_table.rowCount()
-        self.results_table.insertRow(row_position)
-
-        load_time_str = f"{result['load_time_ms']:.2f}" if result['load_time_ms'] >= 0 else "N/A"
-        status_str = result.get('status', 'Unknown')
-        details_str = result.get('error_message', '') if status_str == 'Error' else 'OK'
-        timestamp_str = datetime.fromtimestamp(result.get('timestamp', time.time())).strftime('%Y-%m-%d %H:%M:%S')
-        run_num_str = str(result.get('run_number', '-'))
-
-        self.results_table.setItem(row_position, 0, QTableWidgetItem(result['url']))
-        self.results_table.setItem(row_position, 1, QTableWidgetItem(run_num_str))
-        self.results_table.setItem(row_position, 2, QTableWidgetItem(load_time_str))
-        self.results_table.setItem(row_position, 3, QTableWidgetItem(status_str))
-        self.results_table.setItem(row_position, 4, QTableWidgetItem(details_str))
-        self.results_table.setItem(row_position, 5, QTableWidgetItem(timestamp_str))
+        self._results_version += 1
+        add_result(result) # Persist to the history table (single-row insert)
+
+        # Cell strings are pre-formatted on the worker thread (_display); the
+        # GUI thread only queues the row tuple.
+        display = result['_display']
+        status_str = display['status']
+        run_num_str = display['run_num']
+
+        # Queue the row instead of inserting immediately: per-row inserts plus
+        # resizeColumnsToContents() made every result an O(rows x cols) repaint.
+        self._pending_rows.append(
+            (result['url'], run_num_str, display['load_time'], status_str,
+             display['details'], display['timestamp'])
+        )
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            QTimer.singleShot(100, self._flush_rows)
 
         # Optionally log detailed timing if available
         if result.get('navigation_timing') and status_str == 'Success':
@@ -346,11 +418,26 @@ class SpeedBenchmarkerApp(QMainWindow):
              timing_details += f"Full Load: {timing.get('total_load_from_nav_start', 'N/A')}ms"
              self.log_area.append(timing_details)
 
-        self.results_table.resizeColumnsToContents()
+
+    @pyqtSlot(list)
+    def handle_result_batch(self, results):
+        """Receives a burst of results (e.g. a whole failed URL) in one signal."""
+        for result in results:
+            self.handle_result(result)
+
+    def _flush_rows(self):
+        """Inserts all queued result rows in one batch with repaints disabled."""
+        self._flush_scheduled = False
+        if not self._pending_rows:
+            return
+
+        pending, self._pending_rows = self._pending_rows, []
+        self.results_model.append_rows(pending)
 
 
     @pyqtSlot()
     def test_finished(self):
+        self._flush_rows() # Make sure no queued rows are left pending
         if self.test_worker and not self.test_worker._is_running : # Check if stopped by user
              self.status_bar.showMessage("Test stopped by user.", 5000)
         else:
@@ -375,10 +462,12 @@ class SpeedBenchmarkerApp(QMainWindow):
 
     # --- Results Management ---
     def clear_results_display(self):
-        self.results_table.setRowCount(0) # Clear table contents
+        self.results_model.clear() # Clear table contents
+        self._pending_rows = [] # Drop any rows still queued for insertion
         self.log_area.clear()
         self.dns_results_area.clear()
         self.results_data = [] # Clear internal data storage
+        self._results_version += 1
         self.progress_bar.setValue(0)
         self.progress_bar.setFormat("")
         self.status_bar.showMessage("Results cleared.", 3000)
@@ -387,16 +476,32 @@ class SpeedBenchmarkerApp(QMainWindow):
 
     # --- Reporting ---
     def generate_summary_report(self):
-        """Analyzes results_data and generates summary statistics."""
+        """Analyzes results_data and generates summary statistics.
+
+        Results are bucketed by URL in a single pass (instead of re-scanning
+        the full list per URL), and the computed summary is memoized against
+        _results_version so repeat calls (export, display) are free.
+        """
+        cached_version, cached_summary = self._summary_cache
+        if cached_version == self._results_version:
+            return cached_summary
+
         summary = {}
         if not self.results_data:
+            self._summary_cache = (self._results_version, summary)
             return summary
 
-        urls = sorted(list(set(r['url'] for r in self.results_data)))
+        by_url = {}
+        for r in self.results_data:
+            buckets = by_url.setdefault(r['url'], {'ok': [], 'err': []})
+            if r['status'] == 'Success':
+                buckets['ok'].append(r)
+            elif r['status'] == 'Error':
+                buckets['err'].append(r)
 
-        for url in urls:
-            url_results = [r for r in self.results_data if r['url'] == url and r['status'] == 'Success']
-            url_errors = [r for r in self.results_data if r['url'] == url and r['status'] == 'Error']
+        for url in sorted(by_url):
+            url_results = by_url[url]['ok']
+            url_errors = by_url[url]['err']
 
             load_times = [r['load_time_ms'] for r in url_results if r['load_time_ms'] >= 0]
 
@@ -424,9 +529,16 @@ class SpeedBenchmarkerApp(QMainWindow):
                     'std_dev_load_time_ms': 'N/A',
                     'error_messages': [e.get('error_message', 'Unknown Error') for e in url_errors]
                  }
+
+        self._summary_cache = (self._results_version, summary)
         return summary
 
 
+    def iter_summary_rows(self):
+        """Yields per-URL summary dicts one at a time for streaming exports."""
+        yield from self.generate_summary_report().values()
+
+
     def export_report(self):
         if not self.results_data:
             QMessageBox.information(self, "No Results", "No results to export.")
@@ -463,8 +575,7 @@ class SpeedBenchmarkerApp(QMainWindow):
             if export_format == "CSV":
                 # Option 1: Export raw results
                 # Option 2: Export summary report (more useful)
-                summary = self.generate_summary_report()
-                if not summary:
+                if not self.generate_summary_report():
                      QMessageBox.warning(self, "Export Error", "Could not generate summary report.")
                      return
 
@@ -476,12 +587,19 @@ class SpeedBenchmarkerApp(QMainWindow):
                         'min_load_time_ms', 'max_load_time_ms',
                         'std_dev_load_time_ms', 'error_messages'
                         ]
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    for url_summary in summary.values():
-                         # Convert list of errors to a string for CSV
-                         url_summary['error_messages'] = "; ".join(url_summary.get('error_messages', []))
-                         writer.writerow(url_summary)
+                    # Positional csv.writer + writerows skips DictWriter's
+                    # per-row fieldname lookups; errors are flattened inline
+                    # so the memoized summary is never mutated.
+                    writer = csv.writer(f)
+                    writer.writerow(fieldnames)
+                    writer.writerows(
+                        (s['url'], s['num_successful_runs'], s['num_errors'],
+                         s['avg_load_time_ms'], s['median_load_time_ms'],
+                         s['min_load_time_ms'], s['max_load_time_ms'],
+                         s['std_dev_load_time_ms'],
+                         "; ".join(s.get('error_messages', [])))
+                        for s in self.iter_summary_rows()
+                    )
 
             elif export_format == "JSON":
                  # Export both raw data and summary
@@ -490,8 +608,12 @@ class SpeedBenchmarkerApp(QMainWindow):
                      "raw_results": self.results_data,
                      "test_configuration": {k: v for k, v in self.settings.items() if k != 'results'} # Exclude raw results from config part
                  }
-                 with open(filename, 'w', encoding='utf-8') as f:
-                     json.dump(export_data, f, indent=2)
+                 if orjson is not None:
+                     with open(filename, 'wb') as f:
+                         f.write(orjson.dumps(export_data, option=orjson.OPT_INDENT_2, default=str))
+                 else:
+                     with open(filename, 'w', encoding='utf-8') as f:
+                         json.dump(export_data, f, indent=2, default=str)
 
             self.status_bar.showMessage(f"Report exported successfully to {filename}", 5000)
 
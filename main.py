@@ -1,45 +1,69 @@
 import sys
 import subprocess
 import logging
-import importlib.metadata
+import importlib.util
+import hashlib
 import os
-
-# Ensure the script directory is in the path if running from elsewhere
-script_dir = os.path.dirname(os.path.abspath(__file__))
-if script_dir not in sys.path:
-    sys.path.insert(0, script_dir)
+import threading
 
 # --- Dependency Check and Installation ---
 REQUIRED_PACKAGES = {
+    # import name -> pip install name
     'PyQt6': 'PyQt6',
     'selenium': 'selenium',
-    'webdriver-manager': 'webdriver-manager',
-    'dnspython': 'dnspython' # Add this line
+    'webdriver_manager': 'webdriver-manager',
+    'dns': 'dnspython'
 }
 
+# Sentinel recording a successful dependency check; while the interpreter and
+# package list are unchanged, later launches skip the check entirely
+DEPS_SENTINEL_FILE = '.deps_ok'
+
+
+def _deps_fingerprint():
+    payload = sys.executable + '|' + ','.join(sorted(REQUIRED_PACKAGES.values()))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _write_deps_sentinel():
+    try:
+        with open(DEPS_SENTINEL_FILE, 'w') as f:
+            f.write(_deps_fingerprint())
+    except OSError:
+        pass  # Sentinel is only an optimization; ignore write failures
+
 
 def check_and_install_dependencies():
     """Checks for required packages and attempts to install missing ones using pip."""
+    # Fast path: a previous successful check recorded a sentinel for this
+    # interpreter + package set
+    try:
+        with open(DEPS_SENTINEL_FILE, 'r') as f:
+            if f.read().strip() == _deps_fingerprint():
+                return True
+    except OSError:
+        pass
+
     missing_packages = []
     for import_name, install_name in REQUIRED_PACKAGES.items():
-        try:
-            importlib.metadata.version(install_name)
+        # find_spec only consults sys.path - much cheaper than parsing
+        # dist-info metadata for the happy path
+        if importlib.util.find_spec(import_name) is not None:
             print(f"Requirement already satisfied: {install_name}")
-        except importlib.metadata.PackageNotFoundError:
+        else:
             print(f"Requirement not satisfied: {install_name}. Marked for installation.")
             missing_packages.append(install_name)
-        except Exception as e:
-            print(f"Error checking package {install_name}: {e}. Assuming it needs installation.")
-            missing_packages.append(install_name)  # Be safe
 
     if not missing_packages:
         print("All dependencies are satisfied.")
+        _write_deps_sentinel()
         return True
 
     print(f"\nAttempting to install missing packages: {', '.join(missing_packages)}")
     pip_executable = sys.executable.replace('pythonw.exe', 'python.exe')  # Ensure using console python for pip
 
-    # Ensure pip is available and up-to-date (optional but good practice)
+    # Ensure pip is up-to-date; only worth a subprocess when something
+    # actually needs installing
     try:
         print("Ensuring pip is up-to-date...")
         subprocess.check_call([pip_executable, "-m", "pip", "install", "--upgrade", "pip"],
@@ -72,12 +96,11 @@ def check_and_install_dependencies():
     print("\nDependency installation attempt finished.")
     # Optional: Re-verify after installation
     print("Re-verifying dependencies...")
+    importlib.invalidate_caches()  # Pick up freshly installed packages
     final_missing = []
     for import_name, install_name in REQUIRED_PACKAGES.items():
         if install_name in missing_packages:  # Only re-check those we tried to install
-            try:
-                importlib.metadata.version(install_name)
-            except importlib.metadata.PackageNotFoundError:
+            if importlib.util.find_spec(import_name) is None:
                 print(f"Verification failed: {install_name} still not found after installation attempt.")
                 final_missing.append(install_name)
 
@@ -88,11 +111,21 @@ def check_and_install_dependencies():
         return False
 
     print("All required dependencies seem to be installed now.")
+    _write_deps_sentinel()
     return True
 
 
 # --- Main Application Execution ---
 if __name__ == "__main__":
+    # Ensure the script directory is in the path if running from elsewhere.
+    # Done only when executed as a script: importing main as a module should
+    # not stat the filesystem or mutate sys.path (which invalidates the
+    # importlib caches). When launched normally the interpreter already put
+    # the script directory at sys.path[0], so the insert is skipped.
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if sys.path[0] != script_dir and script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
     logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s',
                         handlers=[logging.FileHandler("benchmark_app.log"), logging.StreamHandler()])
 
@@ -134,5 +167,20 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     main_window = SpeedBenchmarkerApp()
     main_window.show()
+
+    # Resolve the driver executable path in the background so a first-run
+    # user does not pay webdriver-manager's ~2s network lookup when they
+    # click Start; by then the path cache is warm and setup_driver is local.
+    def _prewarm_driver_path():
+        try:
+            from selenium_utils import _resolve_driver_path
+            _resolve_driver_path(main_window.settings.get('browser', 'Chrome'))
+            logging.info("Driver path cache prewarmed.")
+        except Exception as e:
+            # Purely an optimization; setup_driver will resolve on demand
+            logging.warning(f"Driver path prewarm failed: {e}")
+
+    threading.Thread(target=_prewarm_driver_path, name="driver-prewarm", daemon=True).start()
+
     logging.info("GUI displayed. Starting event loop.")
     sys.exit(app.exec())
\ No newline at end of file
@@ -1,8 +1,30 @@
 import json
 import os
+import sqlite3
+import time
 import logging
 
+try:
+    import orjson  # Optional: much faster C-level JSON codec for settings values
+except ImportError:
+    orjson = None
+
+# Bound once at import; every settings value and result config row goes
+# through these. orjson returns/accepts bytes, sqlite wants TEXT, hence the
+# thin decode shim.
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps(value):
+        return orjson.dumps(value).decode('utf-8')
+else:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
+# Legacy JSON file; migrated into SETTINGS_DB on first run and then left alone
 SETTINGS_FILE = 'settings.json'
+SETTINGS_DB = 'settings.db'
+
 DEFAULT_SETTINGS = {
   "urls": [
     "https://www.google.com",
@@ -16,43 +38,131 @@ DEFAULT_SETTINGS = {
    # Options: ReadyState, LoadEventEnd, Combined
   "wait_strategy": "Combined",
   "anti_detection_enabled": True,
+  "restart_driver_per_url": False, # Fresh browser per URL (slower, full isolation)
+  "parallel_drivers": 1, # >1 tests URLs concurrently over a driver pool
+  "lightweight_mode": False, # Skip images/media for pure-latency runs
   "export_format": "CSV", # Options: CSV, JSON
-  "results": [] # Stores past results if needed, or keep empty
 }
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def load_settings():
-    """Loads settings from SETTINGS_FILE, using defaults if file not found or invalid."""
+_conn = None
+# Serialized snapshot of the last loaded/saved settings; lets save_settings
+# upsert only the keys that actually changed (and no-op when none did)
+_last_saved = None
+
+
+def _get_conn():
+    """Returns the settings database connection, creating/migrating on first use."""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(SETTINGS_DB)
+        # WAL keeps single-row commits cheap and readers unblocked
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " url TEXT NOT NULL,"
+            " ts REAL NOT NULL,"
+            " load_ms REAL,"
+            " status TEXT,"
+            " config_json TEXT)"
+        )
+        _conn.commit()
+        _migrate_legacy_json(_conn)
+    return _conn
+
+
+def _migrate_legacy_json(conn):
+    """One-time import of an existing settings.json into the database."""
+    if conn.execute("SELECT COUNT(*) FROM settings").fetchone()[0] > 0:
+        return # Already populated
     if not os.path.exists(SETTINGS_FILE):
-        logging.warning(f"{SETTINGS_FILE} not found. Creating with default settings.")
-        save_settings(DEFAULT_SETTINGS)
-        return DEFAULT_SETTINGS.copy()
+        return
+    try:
+        with open(SETTINGS_FILE, 'rb') as f:
+            legacy = _json_loads(f.read())
+        conn.executemany(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            # The old 'results' list (unbounded history) moves to the results table
+            [(k, _json_dumps(v)) for k, v in legacy.items() if k != 'results']
+        )
+        conn.commit()
+        logging.info(f"Migrated settings from {SETTINGS_FILE} to {SETTINGS_DB}.")
+    except (ValueError, IOError) as e:
+        logging.error(f"Could not migrate {SETTINGS_FILE}: {e}. Starting from defaults.")
+
+
+def load_settings():
+    """Loads settings from the database, filling in any missing defaults."""
+    global _last_saved
     try:
-        with open(SETTINGS_FILE, 'r') as f:
-            settings = json.load(f)
-            # Ensure all default keys exist
-            updated = False
-            for key, value in DEFAULT_SETTINGS.items():
-                if key not in settings:
-                    settings[key] = value
-                    updated = True
-            if updated:
-                save_settings(settings) # Save back if keys were missing
-            return settings
-    except (json.JSONDecodeError, IOError) as e:
-        logging.error(f"Error loading {SETTINGS_FILE}: {e}. Using default settings.")
-        # Optionally backup the corrupted file here
+        conn = _get_conn()
+        rows = conn.execute("SELECT key, value FROM settings").fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"Error loading settings from {SETTINGS_DB}: {e}. Using default settings.")
         return DEFAULT_SETTINGS.copy()
 
+    settings = {}
+    for key, value in rows:
+        try:
+            settings[key] = _json_loads(value)
+        except ValueError:
+            logging.warning(f"Dropping unreadable setting {key!r}.")
+
+    # Ensure all default keys exist
+    updated = False
+    for key, value in DEFAULT_SETTINGS.items():
+        if key not in settings:
+            settings[key] = value
+            updated = True
+
+    # Snapshot what the database already holds so the follow-up save only
+    # writes the merged-in defaults (or nothing at all)
+    _last_saved = {key: value for key, value in rows}
+    if updated:
+        save_settings(settings)
+    return settings
+
+
 def save_settings(settings):
-    """Saves the given settings dictionary to SETTINGS_FILE."""
+    """Upserts changed settings keys; a no-change save does not touch the database."""
+    global _last_saved
+    serialized = {k: _json_dumps(v) for k, v in settings.items()}
+    if serialized == _last_saved:
+        return
+    changed = [(k, v) for k, v in serialized.items()
+               if _last_saved is None or _last_saved.get(k) != v]
     try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings, f, indent=2)
-        logging.info(f"Settings saved to {SETTINGS_FILE}")
-    except IOError as e:
-        logging.error(f"Error saving settings to {SETTINGS_FILE}: {e}")
+        conn = _get_conn()
+        conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", changed)
+        conn.commit()
+        _last_saved = serialized
+        logging.info(f"Settings saved to {SETTINGS_DB} ({len(changed)} key(s) updated)")
+    except sqlite3.Error as e:
+        logging.error(f"Error saving settings to {SETTINGS_DB}: {e}")
+
+
+def add_result(result):
+    """Appends one test result to the history table (single-row insert)."""
+    try:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT INTO results (url, ts, load_ms, status, config_json) VALUES (?, ?, ?, ?, ?)",
+            (result.get('url'),
+             result.get('timestamp', time.time()),
+             result.get('load_time_ms'),
+             result.get('status'),
+             _json_dumps(result.get('config', {})))
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"Error recording result in {SETTINGS_DB}: {e}")
+
 
 # Example usage (optional, for testing)
 if __name__ == '__main__':
@@ -60,4 +170,4 @@ if __name__ == '__main__':
     print("Loaded settings:", settings)
     settings['runs_per_url'] = 5 # Modify a setting
     save_settings(settings)
-    print("Settings saved.")
\ No newline at end of file
+    print("Settings saved.")
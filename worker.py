@@ -1,17 +1,42 @@
 import logging
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from PyQt6.QtCore import QThread, pyqtSignal
 from selenium.common.exceptions import WebDriverException
 
 # Make sure to import setup_driver and measure_load_time
-from selenium_utils import setup_driver, measure_load_time
+from selenium_utils import setup_driver, measure_load_time, reset_browser_state
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+
+def _add_display_strings(result):
+    """Pre-formats the table cell strings on the worker thread.
+
+    String formatting per result is cheap but it all lands on the GUI thread
+    otherwise; doing it here keeps the event loop to Qt-object work only.
+    """
+    status = result.get('status', 'Unknown')
+    result['_display'] = {
+        'load_time': f"{result['load_time_ms']:.2f}" if result['load_time_ms'] >= 0 else "N/A",
+        'status': status,
+        'details': result.get('error_message', '') if status == 'Error' else 'OK',
+        'timestamp': datetime.fromtimestamp(result.get('timestamp', time.time())).strftime('%Y-%m-%d %H:%M:%S'),
+        'run_num': str(result.get('run_number', '-')),
+    }
+    return result
+
+
 class TestWorker(QThread):
     progress = pyqtSignal(int, int)
     status_update = pyqtSignal(str)
     result_ready = pyqtSignal(dict)
+    # Burst results (e.g. all runs of a URL failing at once) arrive as one
+    # list so the GUI crosses the event loop once instead of N times
+    results_batch_ready = pyqtSignal(list)
     finished = pyqtSignal()
     error_occurred = pyqtSignal(str)
     dns_results_ready = pyqtSignal(dict)
@@ -28,8 +53,32 @@ class TestWorker(QThread):
         self.wait_strategy = config.get('wait_strategy', 'Combined')
         # IMPORTANT: Keep anti-detection OFF while debugging this crash
         self.anti_detection = config.get('anti_detection_enabled', False) # Defaulting to False now
+        # Opt-in escape hatch for users who need a fresh browser per URL
+        self.restart_driver_per_url = config.get('restart_driver_per_url', False)
+        # >1 dispatches URLs across a bounded pool of drivers concurrently
+        self.parallel_drivers = config.get('parallel_drivers', 1)
+        # One shared snapshot of the settings that actually describe a run;
+        # copying the full config (urls, results history, ...) per result was
+        # O(runs) wasted copies. Treated as read-only by all consumers.
+        self._config_snapshot = {
+            key: config.get(key)
+            for key in ('browser', 'headless', 'timeout_seconds',
+                        'wait_strategy', 'anti_detection_enabled')
+        }
         self._is_running = True
-        self.driver = None # Driver will be managed inside the loop
+        self.driver = None # One driver reused across URLs (unless restart_driver_per_url)
+        # Cross-thread signals marshal through the Qt event loop; rapid-fire
+        # status lines can starve the GUI thread, so routine ones are
+        # throttled to one per 100ms (important ones pass force=True)
+        self._last_status_ts = 0.0
+
+    def _emit_status(self, message, force=False):
+        """Emits a status line, dropping routine updates within 100ms of the last."""
+        now = time.monotonic()
+        if not force and now - self._last_status_ts < 0.1:
+            return
+        self._last_status_ts = now
+        self.status_update.emit(message)
 
     def run(self):
         total_steps = len(self.urls) * self.runs_per_url
@@ -38,137 +87,269 @@ class TestWorker(QThread):
 
         # --- Run DNS Benchmark if requested ---
         if self.config.get('run_dns_benchmark', False):
-            self.status_update.emit("Running DNS latency benchmark...")
+            self._emit_status("Running DNS latency benchmark...", force=True)
             try:
                 # Import the function from dns_utils
-                from dns_utils import run_dns_benchmark
-                dns_results = run_dns_benchmark()
+                from dns_utils import run_dns_benchmark_qt
+                # Probes run on Qt's global thread pool; wait for the
+                # completion callback so browse tests still start afterwards.
+                dns_done = threading.Event()
+                dns_holder = {}
+
+                def collect_dns_results(results):
+                    dns_holder['results'] = results
+                    dns_done.set()
+
+                run_dns_benchmark_qt(collect_dns_results)
+                dns_done.wait(timeout=60)  # Generous cap; probes time out individually
+                dns_results = dns_holder.get('results', {})
                 self.dns_results_ready.emit(dns_results)  # Emit results
-                self.status_update.emit("DNS benchmark finished.")
+                self._emit_status("DNS benchmark finished.", force=True)
             except Exception as dns_err:
                 logging.exception("Error running DNS benchmark.")
-                self.status_update.emit(f"Error during DNS benchmark: {dns_err}")
+                self._emit_status(f"Error during DNS benchmark: {dns_err}", force=True)
                 # Optionally emit an error result for DNS
                 self.dns_results_ready.emit({"Error": {"status": str(dns_err)}})
 
         # Check if stopped during DNS test
         if not self._is_running:
-            self.status_update.emit("Test stopped after DNS benchmark.")
+            self._emit_status("Test stopped after DNS benchmark.", force=True)
             self.finished.emit()
             return
 
         # --- Existing Browse Test Loop ---
-        self.status_update.emit("Starting Browse speed tests...")
+        self._emit_status("Starting Browse speed tests...", force=True)
 
-        for url in self.urls:
-            if not self._is_running:
-                self.status_update.emit("Test stopped by user.")
-                break
+        if self.parallel_drivers > 1 and len(self.urls) > 1:
+            self._run_parallel(total_steps)
+            logging.info("Worker thread run method finished.")
+            if self._is_running:
+                self._emit_status("Testing finished.", force=True)
+            self.finished.emit()
+            return
 
-            # --- Setup driver INSIDE the URL loop ---
-            self.driver = None # Ensure driver reference is clear before setup
-            try:
-                self.status_update.emit(f"Initializing driver for URL: {url}...")
-                # Ensure anti_detection is definitely off if checkbox was checked
-                current_anti_detection_setting = self.config.get('anti_detection_enabled', False)
-                logging.info(f"Driver setup for {url} with anti-detection: {current_anti_detection_setting}")
-
-                self.driver = setup_driver(
-                    browser_name=self.browser,
-                    headless=self.headless,
-                    anti_detection=current_anti_detection_setting # Use current setting
-                )
-                if not self.driver: # Check if setup_driver potentially returned None
-                    raise WebDriverException("setup_driver returned None unexpectedly.")
-                self.status_update.emit(f"Driver ready for {url}.")
-                logging.info(f"Driver successfully initialized for {url}")
-
-            except Exception as setup_error: # Catch setup errors per URL
-                error_msg = f"Fatal Error initializing driver for {url}: {setup_error}"
-                logging.exception(f"Driver setup failed for {url}") # Log full traceback
-                self.status_update.emit(error_msg)
-                self.error_occurred.emit(error_msg) # Can signal GUI about setup failure
-
-                # Mark all runs for this specific URL as failed because driver failed
-                for run_num_fail in range(self.runs_per_url):
-                     current_step += 1
-                     self.progress.emit(current_step, total_steps)
-                     error_result = {
-                         "url": url,
-                         "load_time_ms": -1,
-                         "status": "Error",
-                         "error_message": f"Driver setup failed: {setup_error}",
-                         "timestamp": time.time(),
-                         "run_number": run_num_fail + 1,
-                         # Include config used for reporting clarity
-                         "config": self.config.copy()
-                     }
-                     self.result_ready.emit(error_result)
-                # Skip to the next URL since driver setup failed
-                continue # Important!
-
-            # --- Run tests for the current URL ---
-            self.status_update.emit(f"Testing URL: {url} ({self.runs_per_url} runs)")
-            for run in range(self.runs_per_url):
+        # One driver is created up front and reused for every URL (browser
+        # cold-start is 1-3s, which dominated multi-URL runs); it is only
+        # re-created if it dies or restart_driver_per_url is set.
+        fatal_driver_error = False
+        try:
+            for url in self.urls:
                 if not self._is_running:
-                    logging.info(f"Stopping inner loop for {url} due to user request.")
-                    break # Break inner loop (runs)
+                    self._emit_status("Test stopped by user.", force=True)
+                    break
+
+                if self.restart_driver_per_url:
+                    self._quit_driver()
+
+                try:
+                    self._ensure_driver(url)
+                except Exception as setup_error: # Catch setup errors per URL
+                    error_msg = f"Fatal Error initializing driver for {url}: {setup_error}"
+                    logging.exception(f"Driver setup failed for {url}") # Log full traceback
+                    self._emit_status(error_msg, force=True)
+                    self.error_occurred.emit(error_msg) # Can signal GUI about setup failure
+
+                    # Mark all runs for this specific URL as failed because
+                    # driver failed; one batched signal + one progress update
+                    # instead of runs_per_url round-trips through the event loop
+                    error_results = []
+                    for run_num_fail in range(self.runs_per_url):
+                         current_step += 1
+                         error_result = {
+                             "url": url,
+                             "load_time_ms": -1,
+                             "status": "Error",
+                             "error_message": f"Driver setup failed: {setup_error}",
+                             "timestamp": time.time(),
+                             "run_number": run_num_fail + 1,
+                             # Include config used for reporting clarity
+                             "config": self._config_snapshot
+                         }
+                         error_results.append(_add_display_strings(error_result))
+                    self.progress.emit(current_step, total_steps)
+                    self.results_batch_ready.emit(error_results)
+                    # Skip to the next URL since driver setup failed
+                    continue # Important!
+
+                # --- Run tests for the current URL ---
+                self._emit_status(f"Testing URL: {url} ({self.runs_per_url} runs)")
+                for run in range(self.runs_per_url):
+                    if not self._is_running:
+                        logging.info(f"Stopping inner loop for {url} due to user request.")
+                        break # Break inner loop (runs)
+
+                    current_step += 1
+                    self.progress.emit(current_step, total_steps)
+                    self._emit_status(f"Running test {run + 1}/{self.runs_per_url} for {url}...")
+                    logging.info(f"Starting measure_load_time for {url}, run {run + 1}")
+
+                    measurement_result = measure_load_time(
+                        self.driver, url, self.timeout, self.wait_strategy
+                    )
+                    measurement_result['run_number'] = run + 1
+                    measurement_result['config'] = self._config_snapshot # Add config used
 
-                current_step += 1
-                self.progress.emit(current_step, total_steps)
-                self.status_update.emit(f"Running test {run + 1}/{self.runs_per_url} for {url}...")
-                logging.info(f"Starting measure_load_time for {url}, run {run + 1}")
+                    logging.info(f"Finished measure_load_time for {url}, run {run + 1}. Status: {measurement_result['status']}")
 
-                measurement_result = measure_load_time(
-                    self.driver, url, self.timeout, self.wait_strategy
-                )
-                measurement_result['run_number'] = run + 1
-                measurement_result['config'] = self.config.copy() # Add config used
+                    if not self._is_running: # Check again before emitting result
+                        logging.info(f"Skipping result emission for {url} run {run + 1} due to stop request.")
+                        break
+                    self.result_ready.emit(_add_display_strings(measurement_result))
 
-                logging.info(f"Finished measure_load_time for {url}, run {run + 1}. Status: {measurement_result['status']}")
+                    # Reset browser state after each run
+                    try:
+                        reset_browser_state(self.driver)
+                    except WebDriverException as reset_error:
+                        # Driver is likely dead; recreate it once for the
+                        # remaining runs/URLs rather than failing them all
+                        logging.warning(f"Driver unresponsive during reset ({reset_error}); recreating.")
+                        self._quit_driver()
+                        try:
+                            self._ensure_driver(url)
+                        except Exception as revive_error:
+                            logging.exception("Could not recreate driver after failure.")
+                            self.error_occurred.emit(f"Driver died and could not be recreated: {revive_error}")
+                            # Fall through to the normal exit path: finished
+                            # must still be emitted or the GUI never unlocks
+                            fatal_driver_error = True
+                            break
+                    except Exception as reset_error:
+                        logging.warning(f"Error resetting browser state: {reset_error}")
 
-                if not self._is_running: # Check again before emitting result
-                    logging.info(f"Skipping result emission for {url} run {run + 1} due to stop request.")
+                    # Add a small delay between runs might help stabilize things? (Optional)
+                    #time.sleep(0.5)
+
+                if fatal_driver_error:
                     break
-                self.result_ready.emit(measurement_result)
+                if not self._is_running: # Check if outer loop should break
+                     logging.info(f"Stopping outer loop after {url} due to user request.")
+                     break
+        finally:
+            # Single quit for the shared driver
+            self._quit_driver()
+
+        logging.info("Worker thread run method finished.")
+        if self._is_running and not fatal_driver_error: # Only emit finished normally if not stopped early
+            self._emit_status("Testing finished.", force=True)
+        self.finished.emit()
+
+    def _run_parallel(self, total_steps):
+        """Tests URLs concurrently over a bounded pool of shared drivers.
+
+        Wall time drops to roughly ceil(urls / pool size) x per-URL time.
+        Each URL task checks a driver out of a queue for its runs and returns
+        it afterwards; PyQt signal emission is thread-safe, so results are
+        emitted directly from the pool threads (the progress counter is the
+        only state that needs a lock).
+        """
+        pool_size = min(self.parallel_drivers, len(self.urls))
+        self._emit_status(f"Starting {pool_size} parallel browser drivers...", force=True)
+
+        drivers = queue.Queue()
+        created = 0
+        try:
+            for _ in range(pool_size):
+                try:
+                    drivers.put(setup_driver(
+                        browser_name=self.browser,
+                        headless=self.headless,
+                        anti_detection=self.config.get('anti_detection_enabled', False),
+                        lightweight_mode=self.config.get('lightweight_mode', False)
+                    ))
+                    created += 1
+                except Exception as setup_error:
+                    logging.exception("Parallel driver setup failed.")
+                    self.error_occurred.emit(f"Driver setup failed: {setup_error}")
+            if created == 0:
+                self._emit_status("No drivers could be started; aborting test.", force=True)
+                return
+
+            progress_lock = threading.Lock()
+            step_counter = [0]
 
-                # Reset browser state after each run
+            def test_url(url):
+                driver = drivers.get()
                 try:
-                    self.driver.get("about:blank")
-                    self.driver.delete_all_cookies()
-                    self.driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': '*', 'storageTypes': 'all'})
-                except Exception as reset_error:
-                    logging.warning(f"Error resetting browser state: {reset_error}")
+                    for run in range(self.runs_per_url):
+                        if not self._is_running:
+                            break
+                        with progress_lock:
+                            step_counter[0] += 1
+                            current_step = step_counter[0]
+                        self.progress.emit(current_step, total_steps)
+                        self._emit_status(f"Running test {run + 1}/{self.runs_per_url} for {url}...")
 
-                # Add a small delay between runs might help stabilize things? (Optional)
-                #time.sleep(0.5)
+                        measurement_result = measure_load_time(
+                            driver, url, self.timeout, self.wait_strategy
+                        )
+                        measurement_result['run_number'] = run + 1
+                        measurement_result['config'] = self._config_snapshot
 
-            # --- Quit driver AFTER all runs for the current URL ---
-            if self.driver:
+                        if not self._is_running:
+                            break
+                        self.result_ready.emit(_add_display_strings(measurement_result))
+
+                        # Reset browser state after each run
+                        try:
+                            reset_browser_state(driver)
+                        except Exception as reset_error:
+                            logging.warning(f"Error resetting browser state: {reset_error}")
+                finally:
+                    drivers.put(driver)
+
+            with ThreadPoolExecutor(max_workers=created) as executor:
+                futures = [executor.submit(test_url, url) for url in self.urls]
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception:
+                        logging.exception("Parallel URL task failed.")
+        finally:
+            while not drivers.empty():
                 try:
-                    logging.info(f"Quitting driver for URL: {url}")
-                    self.driver.quit()
-                    self.status_update.emit(f"Browser driver closed for {url}.")
-                    logging.info(f"Driver quit successfully for {url}.")
+                    drivers.get_nowait().quit()
                 except Exception as quit_error:
-                    self.status_update.emit(f"Warning: Error quitting driver for {url}: {quit_error}")
-                    logging.warning(f"Error quitting driver: {quit_error}")
-            self.driver = None # Explicitly clear reference after quitting
+                    logging.warning(f"Error quitting pooled driver: {quit_error}")
 
-            if not self._is_running: # Check if outer loop should break
-                 logging.info(f"Stopping outer loop after {url} due to user request.")
-                 break
+    def _ensure_driver(self, url):
+        """Creates the shared driver if it does not exist yet."""
+        if self.driver is not None:
+            return
+        self._emit_status(f"Initializing driver for URL: {url}...")
+        # Ensure anti_detection is definitely off if checkbox was checked
+        current_anti_detection_setting = self.config.get('anti_detection_enabled', False)
+        logging.info(f"Driver setup for {url} with anti-detection: {current_anti_detection_setting}")
 
-        # Final driver quit is REMOVED as it's handled per URL
-        logging.info("Worker thread run method finished.")
-        if self._is_running: # Only emit finished normally if not stopped early
-            self.status_update.emit("Testing finished.")
-        self.finished.emit()
+        self.driver = setup_driver(
+            browser_name=self.browser,
+            headless=self.headless,
+            anti_detection=current_anti_detection_setting, # Use current setting
+            lightweight_mode=self.config.get('lightweight_mode', False)
+        )
+        if not self.driver: # Check if setup_driver potentially returned None
+            raise WebDriverException("setup_driver returned None unexpectedly.")
+        self._emit_status(f"Driver ready for {url}.")
+        logging.info(f"Driver successfully initialized for {url}")
+
+    def _quit_driver(self):
+        """Quits the shared driver (if any) and clears the reference."""
+        if not self.driver:
+            return
+        try:
+            logging.info("Quitting driver.")
+            self.driver.quit()
+            self._emit_status("Browser driver closed.")
+            logging.info("Driver quit successfully.")
+        except Exception as quit_error:
+            self._emit_status(f"Warning: Error quitting driver: {quit_error}")
+            logging.warning(f"Error quitting driver: {quit_error}")
+        finally:
+            self.driver = None # Explicitly clear reference after quitting
 
     def stop(self):
         """Signals the worker thread to stop gracefully."""
         logging.info("Stop requested for worker thread.")
-        self.status_update.emit("Stopping test...")
+        self._emit_status("Stopping test...", force=True)
         self._is_running = False
         # Note: If a measure_load_time is in progress, it will likely complete.
         # The check happens before the *next* run or *next* URL.
\ No newline at end of file